@@ -29,21 +29,20 @@ HeinzingerVia16BitDAC::HeinzingerVia16BitDAC(
                               // member was named max_current
     bool verbose_param,
     double max_input_voltage)
-    : max_volt(max_voltage),                 // Initialize from parameter
+    : Interface(device_index), // Opens interface 0 of board #device_index
+      max_volt(max_voltage),                 // Initialize from parameter
       max_curr(max_current_param),           // Initialize from parameter
       verbose(verbose_param),                // Initialize from parameter
+      _usbIndex(device_index),               // Reported by reconnect()
       max_analog_in_volt(max_input_voltage), // Initialize from parameter
       // Initialize cache members defined in Heinzinger.h
       set_volt_cache(0.0), set_curr_cache(0.0), relay_cache(false),
       max_analog_in_volt_bin(0) // Initialize this too
-// Interface member (FGAnalogPSUInterface) is default-constructed
 {
-  Interface.Close();                              // ensure nothing is open
-  if (!Interface.Bridge.OpenDevice(0xA0A0, 0x000C, device_index)) {
-    Utter("Unable to open USB device #" + std::to_string(device_index));
-  }
+  // Interface remembers device_index, so any later reopen (reconnect(), or
+  // Query() after a failed transfer) stays on this board.
   if (!Interface) {
-    Utter("Unable to open interface to analog PSU interface board.\n");
+    Utter("Unable to open USB device #" + std::to_string(device_index));
     // Consider throwing an exception here for better error handling in Python
   }
 
@@ -79,6 +78,9 @@ bool HeinzingerVia16BitDAC::update() {
 
 // Public method implementations
 bool HeinzingerVia16BitDAC::switch_on() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return false;
   Interface.SetRelay(true);
   // Original code had: relay = update(); return relay;
   // 'relay' was a local variable in your original main's scope or uninitialized
@@ -93,6 +95,9 @@ bool HeinzingerVia16BitDAC::switch_on() {
 }
 
 bool HeinzingerVia16BitDAC::switch_off() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return false;
   Interface.SetRelay(false);
   // Similar logic to switch_on for caching and returning state
   return update();
@@ -100,25 +105,15 @@ bool HeinzingerVia16BitDAC::switch_off() {
 
 bool HeinzingerVia16BitDAC::set_voltage(
     double set_val_param) { // Renamed parameter
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return false;
   if (set_val_param > this->max_volt || set_val_param < 0) {
     std::cerr << "Set voltage value lies outside of device's specified range\n";
     return false;
   }
 
-  // Using this-> to be explicit about members
-  double set_percent_of_max = set_val_param / 0.98 / this->max_volt;
-  double required_analog_volt = this->max_analog_in_volt * set_percent_of_max;
-  // Ensure required_analog_volt doesn't exceed max_analog_in_volt (could happen
-  // if set_val_param is at the edge due to 0.98 factor)
-  if (required_analog_volt > this->max_analog_in_volt) {
-    required_analog_volt = this->max_analog_in_volt;
-  }
-  if (required_analog_volt < 0) {
-    required_analog_volt = 0;
-  }
-
-  uint16_t required_register_value = static_cast<uint16_t>(
-      UINT16_MAX * (required_analog_volt / BOARD_MAX_VOLT));
+  uint16_t required_register_value = voltage_to_register(set_val_param);
   if (required_register_value > this->max_analog_in_volt_bin &&
       this->max_analog_in_volt < BOARD_MAX_VOLT) {
     // This check is a bit complex. If max_analog_in_volt_bin represents the
@@ -142,71 +137,136 @@ bool HeinzingerVia16BitDAC::set_voltage(
 
 bool HeinzingerVia16BitDAC::set_current(
     double set_val_param) { // Renamed parameter
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return false;
   if (set_val_param > this->max_curr || set_val_param < 0) {
     std::cerr << "Set current value lies outside of device's specified range\n";
     return false;
   }
 
-  double set_percent_of_max = set_val_param / 0.98 / this->max_curr;
+  Interface.SetDACB(current_to_register(set_val_param));
+  // if (update()) {
+  //     this->set_curr_cache = set_val_param;
+  //     return true;
+  // }
+  // return false;
+  return update();
+}
+
+bool HeinzingerVia16BitDAC::apply(double voltage, double current, bool on) {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return false;
+  if (voltage > this->max_volt || voltage < 0 || current > this->max_curr ||
+      current < 0) {
+    std::cerr << "Apply values lie outside of device's specified range\n";
+    return false;
+  }
+  // SetAll() sends one frame with both DACs and the relay; its reply already
+  // carries fresh readbacks, so no update() round-trip is needed.
+  return Interface.SetAll(voltage_to_register(voltage),
+                          current_to_register(current), on);
+}
+
+uint16_t HeinzingerVia16BitDAC::voltage_to_register(double set_val) const {
+  // Using this-> to be explicit about members
+  double set_percent_of_max = set_val / 0.98 / this->max_volt;
   double required_analog_volt = this->max_analog_in_volt * set_percent_of_max;
+  // Ensure required_analog_volt doesn't exceed max_analog_in_volt (could happen
+  // if set_val is at the edge due to 0.98 factor)
   if (required_analog_volt > this->max_analog_in_volt) {
     required_analog_volt = this->max_analog_in_volt;
   }
   if (required_analog_volt < 0) {
     required_analog_volt = 0;
   }
-  uint16_t required_register_value = static_cast<uint16_t>(
-      UINT16_MAX * (required_analog_volt / BOARD_MAX_VOLT));
+  return static_cast<uint16_t>(UINT16_MAX *
+                               (required_analog_volt / BOARD_MAX_VOLT));
+}
 
-  Interface.SetDACB(required_register_value);
-  // if (update()) {
-  //     this->set_curr_cache = set_val_param;
-  //     return true;
-  // }
-  // return false;
-  return update();
+uint16_t HeinzingerVia16BitDAC::current_to_register(double set_val) const {
+  double set_percent_of_max = set_val / 0.98 / this->max_curr;
+  double required_analog_volt = this->max_analog_in_volt * set_percent_of_max;
+  if (required_analog_volt > this->max_analog_in_volt) {
+    required_analog_volt = this->max_analog_in_volt;
+  }
+  if (required_analog_volt < 0) {
+    required_analog_volt = 0;
+  }
+  return static_cast<uint16_t>(UINT16_MAX *
+                               (required_analog_volt / BOARD_MAX_VOLT));
 }
 
 double HeinzingerVia16BitDAC::read_voltage() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return -1.0;
   if (!Interface.Readout()) { // Ensure data is fresh
     std::cerr << "Failed to readout interface for voltage reading."
               << std::endl;
     return -1.0; // Or some other error indicator, or throw exception
   }
 
-  uint16_t readout_register_value =
-      Interface.ADCB[2]; // Assuming ADCB is populated by Readout()
-  // Constants from your original code for conversion:
-  const double adc_conversion_factor = 3.2 * 3.3 * 1.12;
-  double readout_analog_volt =
-      adc_conversion_factor * readout_register_value / UINT16_MAX;
-  // The PSU's analog input for voltage monitoring is 0-10V, representing
-  // 0-max_volt
-  double converted_output_volt = this->max_volt * readout_analog_volt / 10.0;
-
-  return converted_output_volt;
+  // Assuming ADCB is populated by Readout()
+  return adc_to_voltage(Interface.ADCB[2]);
 }
 
 double HeinzingerVia16BitDAC::read_current() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return -1.0;
   if (!Interface.Readout()) { // Ensure data is fresh
     std::cerr << "Failed to readout interface for current reading."
               << std::endl;
     return -1.0; // Or some other error indicator, or throw exception
   }
 
-  uint16_t readout_register_value =
-      Interface.ADCB[3]; // Assuming ADCB is populated by Readout()
+  // Assuming ADCB is populated by Readout()
+  return adc_to_current(Interface.ADCB[3]);
+}
+
+std::tuple<double, double, bool> HeinzingerVia16BitDAC::read_all() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return std::make_tuple(-1.0, -1.0, false);
+  // One Readout() refreshes every ADC channel and the relay readback, so
+  // there is no need for a USB round-trip per quantity.
+  if (!Interface.Readout()) {
+    std::cerr << "Failed to readout interface for combined reading."
+              << std::endl;
+    return std::make_tuple(-1.0, -1.0, relay_on_unlocked());
+  }
+
+  return std::make_tuple(adc_to_voltage(Interface.ADCB[2]),
+                         adc_to_current(Interface.ADCB[3]), relay_on_unlocked());
+}
+
+double
+HeinzingerVia16BitDAC::adc_to_voltage(uint16_t readout_register_value) const {
+  // Constants from your original code for conversion:
+  const double adc_conversion_factor = 3.2 * 3.3 * 1.12;
+  double readout_analog_volt =
+      adc_conversion_factor * readout_register_value / UINT16_MAX;
+  // The PSU's analog input for voltage monitoring is 0-10V, representing
+  // 0-max_volt
+  return this->max_volt * readout_analog_volt / 10.0;
+}
+
+double
+HeinzingerVia16BitDAC::adc_to_current(uint16_t readout_register_value) const {
   const double adc_conversion_factor = 3.2 * 3.3 * 1.12;
   double readout_analog_volt =
       adc_conversion_factor * readout_register_value / UINT16_MAX;
   // The PSU's analog input for current monitoring is 0-10V, representing
   // 0-max_curr
-  double converted_output_curr = this->max_curr * readout_analog_volt / 10.0;
-
-  return converted_output_curr;
+  return this->max_curr * readout_analog_volt / 10.0;
 }
 
 bool HeinzingerVia16BitDAC::set_max_volt() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return false;
   // This sets the DACA to its max value. The resulting voltage depends on
   // how max_analog_in_volt relates to BOARD_MAX_VOLT and the PSU's response.
   // If max_analog_in_volt_bin is the calibrated max register value for desired
@@ -218,11 +278,17 @@ bool HeinzingerVia16BitDAC::set_max_volt() {
 }
 
 bool HeinzingerVia16BitDAC::set_max_curr() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return false;
   Interface.SetDACB(UINT16_MAX);
   return update();
 }
 
 void HeinzingerVia16BitDAC::readADC() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return;
   if (!Interface.Readout()) {
     std::cerr << "Failed to readout interface for ADC reading." << std::endl;
     return;
@@ -234,6 +300,24 @@ void HeinzingerVia16BitDAC::readADC() {
   std::cout << std::endl;
 }
 
+bool HeinzingerVia16BitDAC::reconnect() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  if (closed)
+    return false;
+  // Same board as the constructor opened; limits and calibration are kept.
+  if (!Interface.Open()) {
+    std::cerr << "Unable to reopen USB device #" << _usbIndex << std::endl;
+    return false;
+  }
+  return update();
+}
+
+void HeinzingerVia16BitDAC::close() {
+  std::lock_guard<std::mutex> lock(io_mutex);
+  closed = true;
+  Interface.Close();
+}
+
 // The main() function from your original Heinzinger.cpp is guarded here.
 // It will not be compiled into the Python module if PYBIND11_MODULE_BUILD is
 // defined. You could define PYBIND11_MODULE_BUILD in your CMakeLists.txt for
@@ -1,10 +1,21 @@
-#include <pybind11/pybind11.h>
-#include <pybind11/stl.h> // For automatic C++/Python STL conversions if needed elsewhere
+#include <nanobind/nanobind.h>
+#include <nanobind/stl/string.h>
+#include <nanobind/stl/tuple.h> // read_all() returns std::tuple
+#include <nanobind/stl/vector.h>
+
+#include <cstdio>
 
 #include "headers/Error.h" // Include Error.h again for direct access to 'extern int Verbosity'
 #include "headers/Heinzinger.h" // This includes AnalogPSU.h -> FGUSBBulk.h -> Error.h (for Verbosity decl)
 
-namespace py = pybind11;
+namespace nb = nanobind;
+
+// Methods that talk to the board over USB drop the GIL for the duration of
+// the transfer, so other Python threads keep running while one waits on the
+// device. Each instance serializes its own transfers with a C++ mutex;
+// is_relay_on() may wait on that mutex too, so it drops the GIL as well.
+// run_psu.psu_lock additionally keeps multi-call sequences together.
+using release_gil = nb::call_guard<nb::gil_scoped_release>;
 
 // --- Getter and Setter for global C++ Verbosity ---
 // These functions will be called from Python.
@@ -14,42 +25,79 @@ int get_cpp_global_verbosity() { return Verbosity; }
 
 void set_cpp_global_verbosity(int v) { Verbosity = v; }
 
-PYBIND11_MODULE(heinzinger_control, m) {
+// "vid:pid" (lower-case hex) of every USB device libusb can see, or an empty
+// list if libusb cannot be initialized. Unlike EnumerateUSBDevices() this
+// never exits the process, so Python can probe before opening a board.
+std::vector<std::string> list_usb_devices() {
+  std::vector<std::string> result;
+  libusb_context *ctx = nullptr;
+  if (libusb_init(&ctx) < 0)
+    return result;
+  libusb_device **list;
+  ssize_t count = libusb_get_device_list(ctx, &list);
+  for (ssize_t i = 0; i < count; ++i) {
+    libusb_device_descriptor desc;
+    if (libusb_get_device_descriptor(list[i], &desc) == 0) {
+      char id[10];
+      std::snprintf(id, sizeof(id), "%04x:%04x", desc.idVendor, desc.idProduct);
+      result.push_back(id);
+    }
+  }
+  if (count >= 0)
+    libusb_free_device_list(list, 1);
+  libusb_exit(ctx);
+  return result;
+}
+
+NB_MODULE(heinzinger_control, m) {
   m.doc() = "Python bindings for Heinzinger Power Supply Control";
 
-  py::class_<HeinzingerVia16BitDAC>(m, "HeinzingerPSU")
-      .def(py::init<int, double, double, bool, double>(),
-           py::arg("device_index")    = 0,
-           py::arg("max_voltage") = 50000.0,
-           py::arg("max_current") = 0.0005, // 0.5 mA
-           py::arg("verbose") =
+  nb::class_<HeinzingerVia16BitDAC>(m, "HeinzingerPSU")
+      .def(nb::init<int, double, double, bool, double>(),
+           nb::arg("device_index")    = 0,
+           nb::arg("max_voltage") = 50000.0,
+           nb::arg("max_current") = 0.0005, // 0.5 mA
+           nb::arg("verbose") =
                false, // This sets FGAnalogPSUInterface::Verbose member
-           py::arg("max_input_voltage") = 10.0)
-      .def("switch_on", &HeinzingerVia16BitDAC::switch_on,
+           nb::arg("max_input_voltage") = 10.0,
+           release_gil()) // Opens and configures the USB device
+      .def("switch_on", &HeinzingerVia16BitDAC::switch_on, release_gil(),
            "Switches the PSU relay on.")
-      .def("switch_off", &HeinzingerVia16BitDAC::switch_off,
+      .def("switch_off", &HeinzingerVia16BitDAC::switch_off, release_gil(),
            "Switches the PSU relay off.")
-      .def("set_voltage", &HeinzingerVia16BitDAC::set_voltage,
-           py::arg("set_val"), "Sets the output voltage.")
-      .def("set_current", &HeinzingerVia16BitDAC::set_current,
-           py::arg("set_val"), "Sets the output current limit.")
-      .def("read_voltage", &HeinzingerVia16BitDAC::read_voltage,
+      .def("set_voltage", &HeinzingerVia16BitDAC::set_voltage, release_gil(),
+           nb::arg("set_val"), "Sets the output voltage.")
+      .def("set_current", &HeinzingerVia16BitDAC::set_current, release_gil(),
+           nb::arg("set_val"), "Sets the output current limit.")
+      .def("apply", &HeinzingerVia16BitDAC::apply, release_gil(),
+           nb::arg("voltage"), nb::arg("current"), nb::arg("on"),
+           "Sets voltage, current limit and relay in one board transaction.")
+      .def("read_voltage", &HeinzingerVia16BitDAC::read_voltage, release_gil(),
            "Reads the measured output voltage.")
-      .def("read_current", &HeinzingerVia16BitDAC::read_current,
+      .def("read_current", &HeinzingerVia16BitDAC::read_current, release_gil(),
            "Reads the measured output current.")
-      .def("set_max_volt", &HeinzingerVia16BitDAC::set_max_volt,
+      .def("read_all", &HeinzingerVia16BitDAC::read_all, release_gil(),
+           "Reads (voltage, current, relay_on) in a single board readout.")
+      .def("set_max_volt", &HeinzingerVia16BitDAC::set_max_volt, release_gil(),
            "Sets the voltage to its maximum configured value.")
-      .def("set_max_curr", &HeinzingerVia16BitDAC::set_max_curr,
+      .def("set_max_curr", &HeinzingerVia16BitDAC::set_max_curr, release_gil(),
            "Sets the current limit to its maximum configured value.")
-      .def("is_relay_on", &HeinzingerVia16BitDAC::is_relay_on,
+      .def("is_relay_on", &HeinzingerVia16BitDAC::is_relay_on, release_gil(),
          "Return True if the PSU output relay is closed (output ON).")
-      .def("readADC", &HeinzingerVia16BitDAC::readADC,
-           "Reads and prints raw ADC values (for debugging).");
+      .def("readADC", &HeinzingerVia16BitDAC::readADC, release_gil(),
+           "Reads and prints raw ADC values (for debugging).")
+      .def("reconnect", &HeinzingerVia16BitDAC::reconnect, release_gil(),
+           "Reopens the USB device after a communication failure.")
+      .def("close", &HeinzingerVia16BitDAC::close, release_gil(),
+           "Releases the USB interface; later calls fail without I/O.");
+
+  m.def("list_devices", &list_usb_devices, release_gil(),
+        "Lists connected USB devices as 'vid:pid' hex strings.");
 
   // Expose the global C++ Verbosity variable to Python using getter and setter
   // functions
   m.def("get_cpp_verbosity_level", &get_cpp_global_verbosity,
         "Gets the C++ global Verbosity level.");
-  m.def("set_cpp_verbosity_level", &set_cpp_global_verbosity, py::arg("level"),
+  m.def("set_cpp_verbosity_level", &set_cpp_global_verbosity, nb::arg("level"),
         "Sets the C++ global Verbosity level.");
 }
\ No newline at end of file
@@ -2,14 +2,18 @@
 """
 dummy_psu_service.py
 A stand-alone Flask server that pretends to be the Heinzinger PSU.
-It keeps three in-memory variables and exposes four REST endpoints.
+It keeps three in-memory variables and exposes five REST endpoints.
 
     POST /set_voltage   { "value": <float> }   → {"ok": true}
     POST /set_current   { "value": <float> }   → {"ok": true}
     POST /relay         { "state": true|false }→ {"ok": true}
     GET  /read                                → {"voltage":…, "current":…, "on":…}
+    GET  /read_fast                           → same as /read, bypassing Flask
 """
-from flask import Flask, request, jsonify
+import math
+import orjson
+from flask import Flask, Response, request
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
 app = Flask(__name__)
 
@@ -22,31 +26,103 @@ _state = {
     "on":      False   # output enabled?
 }
 
+# Error bodies for a missing/invalid field, encoded once.
+_FIELD_ERRORS = {
+    name: orjson.dumps({"error": f"JSON must contain field '{name}'"})
+    for name in ("value", "state")
+}
+_ERR_CONTENT_TYPE = orjson.dumps({"error": "Content-Type must be application/json"})
+
 # ---------- Helper ---------------------------------------------------
+def ojson(obj):
+    """Like flask.jsonify, but encoded with orjson (C) instead of stdlib json."""
+    return Response(orjson.dumps(obj), mimetype="application/json")
+
+def field_error(name):
+    """400 for a missing or unusable field; like the real service's reply."""
+    return Response(_FIELD_ERRORS[name], status=400, mimetype="application/json")
+
+def body_field(name, convert):
+    """Converted field from the JSON body, or None if absent/invalid."""
+    try:
+        return convert(orjson.loads(request.get_data(cache=False))[name])
+    except (TypeError, KeyError, ValueError): # JSONDecodeError is a ValueError
+        return None
+
+def as_float(value):
+    """
+    float(value), rejecting JSON true/false and NaN/inf like the real
+    service (whose range check fails for them); clamp() would otherwise
+    turn NaN into full scale.
+    """
+    if isinstance(value, bool):
+        raise TypeError("expected a number, got a boolean")
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError("expected a finite number")
+    return value
+
+def as_bool(value):
+    """JSON true/false only; bool() would read "false" as True."""
+    if not isinstance(value, bool):
+        raise TypeError("expected true or false")
+    return value
+
 def clamp(x, lo, hi):        # stop the “supply” at 0…30 kV and 0…2 A
     return max(lo, min(hi, x))
 
 # ---------- End-points ----------------------------------------------
+@app.before_request
+def require_json():
+    """415 for POST bodies declared as non-JSON, like the real service."""
+    if request.method == "POST" and request.mimetype and not request.is_json:
+        return Response(_ERR_CONTENT_TYPE, status=415, mimetype="application/json")
+
 @app.post("/set_voltage")
 def set_voltage():
-    _state["voltage"] = clamp(float(request.json["value"]), 0, 30_000)
-    return jsonify(ok=True)
+    value = body_field("value", as_float)
+    if value is None:
+        return field_error("value")
+    _state["voltage"] = clamp(value, 0, 30_000)
+    return ojson({"ok": True})
 
 @app.post("/set_current")
 def set_current():
-    _state["current"] = clamp(float(request.json["value"]), 0, 2)
-    return jsonify(ok=True)
+    value = body_field("value", as_float)
+    if value is None:
+        return field_error("value")
+    _state["current"] = clamp(value, 0, 2)
+    return ojson({"ok": True})
 
 @app.post("/relay")
 def relay():
-    _state["on"] = bool(request.json["state"])
-    return jsonify(ok=True)
+    state = body_field("state", as_bool)
+    if state is None:
+        return field_error("state")
+    _state["on"] = state
+    return ojson({"ok": True})
 
 @app.get("/read")
 def read():
-    return jsonify(_state)
+    return ojson(_state)
+
+def wsgi_read(environ, start_response):
+    """
+    /read as a bare WSGI callable: no routing, request context or Response
+    object, so load generators aimed at it measure the server and network
+    rather than Flask.
+    """
+    body = orjson.dumps(_state)
+    start_response("200 OK", [("Content-Type", "application/json"),
+                              ("Content-Length", str(len(body)))])
+    return [body]
+
+app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {"/read_fast": wsgi_read})
 
 # --------------------------------------------------------------------
 if __name__ == "__main__":
-    # 0.0.0.0 ⇒ listen on ALL local interfaces (good for later LAN tests)
-    app.run(host="0.0.0.0", port=5001, threaded=True)
\ No newline at end of file
+    # 0.0.0.0 ⇒ listen on ALL local interfaces (good for later LAN tests).
+    # Served by waitress like the real services, so load tests against the
+    # dummy measure the same server rather than Werkzeug's dev server.
+    from waitress import serve
+    serve(app, host="0.0.0.0", port=5001, threads=4, connection_limit=100)
\ No newline at end of file
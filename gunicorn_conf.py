@@ -0,0 +1,20 @@
+"""
+gunicorn_conf.py
+Gunicorn settings for the PSU services, an alternative to the waitress
+launchers in run_psu_service*.py:
+
+    gunicorn -c gunicorn_conf.py -b 0.0.0.0:5000 'run_psu_service:create_app()'
+    gunicorn -c gunicorn_conf.py -b 0.0.0.0:5001 'run_psu_service2:create_app()'
+"""
+# Exactly one worker process: the PSU instance and its device lock are
+# per-process globals, and a second worker would try to open the same
+# USB board again. For the same reason there is no reuse_port: scaling
+# out means one process per board (see the launchers), not per core.
+workers = 1
+
+# Threads are cheap here; device access is serialized inside the app, and
+# cached /read responses don't touch the device at all. Every open /stream
+# holds a thread for as long as the dashboard is connected; at most
+# psu_service.STREAM_MAX_CLIENTS (4) may, so the rest stay free for commands.
+worker_class = "gthread"
+threads = 8
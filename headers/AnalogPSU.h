@@ -48,6 +48,9 @@ public:
 
   // --- Member variables remain the same ---
   FGUSBBulk Bridge;
+  // Which of several identical boards Open() picks (OpenDevice's Skip), so a
+  // reopen after a failed transfer never lands on a different board.
+  int BoardIndex;
   int16_t ADCA[4];
   uint16_t ADCB[4];
   uint16_t DACA_val;
@@ -58,14 +61,15 @@ public:
   bool Verbose = true;
 
   // --- Constructor, Open, Close, operator bool remain the same ---
-  FGAnalogPSUInterface()
-      : DACA_val(0), DACB_val(0), Relay_val(0), SequenceNo_val(0), Errors(0) {
+  explicit FGAnalogPSUInterface(int BoardIndex = 0)
+      : BoardIndex(BoardIndex), DACA_val(0), DACB_val(0), Relay_val(0),
+        SequenceNo_val(0), Errors(0) {
     Open();
   }
   FGAnalogPSUInterface(const FGAnalogPSUInterface &) = delete;
   bool Open() {
     Close();
-    bool success = Bridge.OpenDevice(0xA0A0, 0x000C, 0);
+    bool success = Bridge.OpenDevice(0xA0A0, 0x000C, 0, BoardIndex);
     if (Verbose && success)
       std::cout << "Refactored AnalogPSU: USB Device Opened." << std::endl;
     else if (Verbose && !success)
@@ -108,6 +112,17 @@ public:
     cmdStatus.Relay = Power ? 1 : 0;
     return Query(cmdStatus);
   }
+  // Both DACs and the relay in one frame (one USB round-trip)
+  bool SetAll(uint16_t A, uint16_t B, bool Power) {
+    Status_t cmdStatus;
+    memset(&cmdStatus, 0, sizeof(cmdStatus));
+    cmdStatus.MagicNo = ExpectedMagic;
+    cmdStatus.SetMask = 1 | 2 | 4;
+    cmdStatus.DACA = A;
+    cmdStatus.DACB = B;
+    cmdStatus.Relay = Power ? 1 : 0;
+    return Query(cmdStatus);
+  }
   bool Readout() {
     Status_t cmdStatus;
     memset(&cmdStatus, 0, sizeof(cmdStatus));
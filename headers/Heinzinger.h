@@ -3,6 +3,8 @@
 
 #include "AnalogPSU.h" // For the FGAnalogPSUInterface member
 #include <stdint.h>    // For uint16_t etc.
+#include <mutex>       // For io_mutex
+#include <tuple>       // For read_all()
 
 // Declaration of the HeinzingerVia16BitDAC class
 class HeinzingerVia16BitDAC {
@@ -25,9 +27,24 @@ private:
   double max_curr;
 
   bool verbose;
-  int _usbIndex;   // store which identical device to open
+  int _usbIndex;   // which of the identical boards to open (0 = first found)
+
+  // Held by every public method that talks to the board, so one instance
+  // can be shared between threads even with the GIL released.
+  mutable std::mutex io_mutex;
+  // Set by close(). Afterwards every call fails without touching USB, rather
+  // than letting FGAnalogPSUInterface::Query() silently reopen a board.
+  bool closed = false;
 
   bool update(); // This is a private helper
+  bool relay_on_unlocked() const { return Interface.Relay_val != 0; } // Caller holds io_mutex
+
+  // Convert raw ADC B readback registers to physical units (no USB I/O)
+  double adc_to_voltage(uint16_t register_value) const;
+  double adc_to_current(uint16_t register_value) const;
+  // Convert setpoints to DAC register values (no USB I/O)
+  uint16_t voltage_to_register(double set_val) const;
+  uint16_t current_to_register(double set_val) const;
 
 public:
   // Constructor
@@ -39,16 +56,25 @@ public:
   bool switch_off();
   bool set_voltage(double set_val);
   bool set_current(double set_val);
+  // Voltage, current and relay state written in a single board transaction
+  bool apply(double voltage, double current, bool on);
   bool is_relay_on() const               // true => output enabled
   {
-    return Interface.Relay_val != 0;   // Relay_val comes from the board
+    std::lock_guard<std::mutex> lock(io_mutex);
+    return relay_on_unlocked();        // Relay_val comes from the board
   }
 
   double read_voltage();
   double read_current();
+  // Voltage, current and relay state from a single board readout
+  std::tuple<double, double, bool> read_all();
   bool set_max_volt();
   bool set_max_curr();
   void readADC();
+  // Reopen this board's USB device after a failed transfer (e.g. a replug)
+  bool reconnect();
+  // Release the USB interface now, independent of when the object is freed
+  void close();
 };
 
 #endif // HEINZINGER_H
\ No newline at end of file
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+psu_service.py
+Flask app factory shared by the per-board services
+(run_psu_service.py → board #0, run_psu_service2.py → board #1).
+
+    POST /set_voltage   { "value": <float> }      → {"ok": …}
+    POST /set_current   { "value": <float> }      → {"ok": …}
+    GET  /read                                   → {"voltage":…, "current":…, "on":…}
+    GET  /relay                                  → {"on": …}
+    POST /relay         { "state": true|false }   → {"ok": …, "on": …}
+    POST /apply         { "voltage": <float>, "current": <float>, "state": true|false } → {"ok": …, "on": …}
+    POST /batch         { "requests": [ … ] }     → {"responses": [ … ]}
+    GET  /read.bin                               → 9 bytes, see READING_STRUCT
+    GET  /stream                                 → text/event-stream of /read bodies
+                                                   (at most STREAM_MAX_CLIENTS at once)
+    GET  /                                       → {"psu": {device_index, limits…}, "endpoints": […]}
+"""
+import atexit
+import functools
+import hashlib
+import logging
+import logging.handlers
+import os
+import queue
+import signal
+import struct
+import sys
+import threading
+import time
+import orjson
+from flask import Flask, Response, request
+import run_psu                    #(imports heinzinger as well)
+
+log = logging.getLogger(__name__)
+
+# Dashboards poll /read several times a second; within this window the
+# last reading is served again instead of going back to the device.
+# Any write clears it so the next read reflects the new setpoint.
+# Override with PSU_READ_TTL_MS (0 disables caching; requests that arrive
+# while a read is in progress still share its result).
+READ_CACHE_TTL = float(os.environ.get("PSU_READ_TTL_MS", "200")) / 1000.0  # seconds
+
+# Binary reading for high-rate scrapers (/read.bin), little-endian:
+#   float32 voltage, float32 current, uint8 relay (1 = output on)
+READING_STRUCT = struct.Struct("<ffB")
+
+# How often /stream pushes a reading to its subscribers.
+STREAM_INTERVAL = float(os.environ.get("PSU_STREAM_INTERVAL_MS", "200")) / 1000.0  # seconds
+
+# Each open /stream holds a server worker thread for as long as the client
+# stays connected. The launchers run 8 threads; capping streams at half of
+# that keeps workers free for /set_voltage, /relay and /apply, so the output
+# can always be switched off. Further streams get a 503.
+# Override with PSU_STREAM_MAX_CLIENTS, keeping it below the thread count.
+STREAM_MAX_CLIENTS = int(os.environ.get("PSU_STREAM_MAX_CLIENTS", "4"))
+
+# Response headers are built once and shared by every response.
+# /read says "no-cache" rather than "no-store": clients must revalidate
+# each time, but can still do so cheaply with If-None-Match (ETag).
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_READ_HEADERS = {"Content-Type": "application/json", "Cache-Control": "no-cache"}
+_READ_BIN_HEADERS = {"Content-Type": "application/octet-stream", "Cache-Control": "no-cache"}
+
+# ---------- Helpers --------------------------------------------------
+def setup_logging(level=logging.INFO):
+    """
+    Send log records through a queue so request threads never block on
+    the terminal or journald; a listener thread does the actual writes.
+    Call once from the launcher, before create_app().
+    """
+    q = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(q))
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(q, handler)
+    listener.start()
+    atexit.register(listener.stop) # Flush what is still queued on exit
+    return listener
+
+def exit_on_sigterm():
+    """
+    Turn SIGTERM (systemd stop, docker stop, kill) into a normal exit so
+    atexit handlers run: the log queue is flushed and the PSU's USB
+    interface is released. Call from the launcher's main thread; gunicorn
+    installs its own handlers.
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+def ojson(obj, status=200):
+    """Like flask.jsonify, but encoded with orjson (C) instead of stdlib json."""
+    return Response(orjson.dumps(obj), status=status, headers=_JSON_HEADERS)
+
+@functools.lru_cache(maxsize=None)
+def _error_body(message):
+    """{"error": message} encoded once; only use for fixed messages."""
+    return orjson.dumps({"error": message})
+
+def _error(message, status=400):
+    """Error response for a fixed message, without re-encoding it."""
+    return Response(_error_body(message), status=status, headers=_JSON_HEADERS)
+
+def _json_body():
+    """
+    Decode the request body with orjson, or None if it is not valid JSON.
+
+    Reads the raw bytes without caching them on the request and skips
+    get_json()'s content-type and charset handling.
+    """
+    try:
+        return orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return None
+
+def _as_float(value):
+    """float(value), but JSON true/false is rejected instead of read as 1.0/0.0."""
+    if isinstance(value, bool):
+        raise TypeError("expected a number, got a boolean")
+    return float(value)
+
+def _as_bool(value):
+    """JSON true/false only; bool() would read "false" or 0.5 as True."""
+    if not isinstance(value, bool):
+        raise TypeError("expected true or false")
+    return value
+
+def _body_field(name, convert):
+    """
+    Pull one field out of the JSON body and convert it.
+
+    Returns (value, None) on success or (None, error_response) so handlers
+    can bail out with a 400 instead of raising a KeyError/ValueError (500).
+    """
+    data = _json_body()
+    if not isinstance(data, dict) or name not in data:
+        return None, _error(f"JSON must contain field '{name}'")
+    try:
+        return convert(data[name]), None
+    except (TypeError, ValueError):
+        return None, _error(f"Field '{name}' has an invalid value")
+
+def validated_scalar(field, lo, hi):
+    """
+    Decorator for POST views that take one number from the JSON body.
+
+    The field is parsed and range-checked before the view runs; bad input
+    gets a 400 without the view (or the PSU) being touched. The view
+    receives the float as its last positional argument. The bounds are
+    plain numbers bound once here, not looked up per request, and the
+    out-of-range body is pre-encoded with only the value left to fill in.
+    """
+    out_of_range = orjson.dumps(
+        {"error": f"Field '{field}' = %s outside range [{lo}, {hi}]"})
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrap(*args, **kwargs):
+            value, err = _body_field(field, _as_float)
+            if err:
+                return err
+            if not lo <= value <= hi:
+                return Response(out_of_range % repr(value).encode(),
+                                status=400, headers=_JSON_HEADERS)
+            return fn(*args, value, **kwargs)
+        return wrap
+    return deco
+
+class Broadcaster:
+    """
+    Fans one reading out to every /stream subscriber.
+
+    A single daemon thread calls source() every `interval` seconds while
+    anyone is subscribed and hands the result to each subscriber's queue,
+    so N dashboards cost one device read per tick rather than N polls.
+    Each queue holds only the newest item; a slow client skips readings
+    instead of falling behind. At most `max_subscribers` may be subscribed
+    at once; subscribe() returns None beyond that.
+    """
+    def __init__(self, source, interval, max_subscribers):
+        self.source = source
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=1)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="psu-stream",
+                                                daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None # Next subscribe() starts a new one
+                    return
+                subscribers = list(self._subscribers)
+            try:
+                item = self.source()
+            except Exception as exc:
+                log.error("Stream reading failed: %s", exc)
+            else:
+                for q in subscribers:
+                    try:
+                        q.get_nowait() # Drop the reading the client never took
+                    except queue.Empty:
+                        pass
+                    q.put_nowait(item)
+            time.sleep(self.interval)
+
+# ---------- App factory ----------------------------------------------
+def create_app(device_index=0, verb=False):
+    """
+    Open PSU #device_index and return a Flask app exposing it over REST.
+
+    The device is opened here, at startup, rather than on the first request:
+    a missing or misconfigured board stops the service immediately instead
+    of surfacing as errors once a client starts talking to it.
+    """
+    psu = run_psu.get_psu_instance(device_index=device_index, verb=verb)
+    if psu is None:
+        raise RuntimeError(f"Could not initialize PSU #{device_index}, "
+                           "see messages above.")
+    atexit.register(run_psu.cleanup_psu) # Idempotent; releases the USB interface
+    # Capability checks on the instance; the views below must not capture
+    # it (see device()).
+    has_apply = hasattr(psu, "apply")
+    can_reconnect = hasattr(psu, "reconnect")
+    app = Flask(__name__)
+    # Every rule is a fixed path with no converters; matching "/read/" as
+    # well as "/read" spares clients a redirect and a second match pass.
+    app.url_map.strict_slashes = False
+
+    # One USB transaction at a time: the threaded server may run several
+    # requests concurrently, but they must not interleave on the device.
+    lock = run_psu.psu_lock
+
+    def device():
+        """
+        The open PSU. Caller must hold the lock.
+
+        Looked up on every use instead of being captured, so that once
+        cleanup_psu() has closed it nothing here keeps the object alive.
+        """
+        psu = run_psu.current_instance()
+        if psu is None:
+            raise RuntimeError(f"PSU #{device_index} has been closed")
+        return psu
+
+    # Setpoint endpoints only differ in the C++ method they call (named like
+    # the endpoint) and the limit bounding their value.
+    cfg = run_psu.psu_config
+    setter_limits = {
+        "set_voltage": cfg.max_voltage,
+        "set_current": cfg.max_current,
+    }
+
+    def read_payload():
+        """
+        One reading of the PSU. Caller must hold the lock. run_psu picks
+        read_all() or, on older builds, one readout per quantity.
+        """
+        voltage, current, on = run_psu.read_psu_all()
+        return {
+            "voltage": voltage,
+            "current": current,
+            "on": on
+        }
+
+    def fresh_reading():
+        """/read body, its ETag and the /read.bin body, once per cache fill."""
+        with lock:
+            payload = read_payload()
+            # The C++ layer reports a failed readout as -1. The device handle
+            # is kept for the life of the process, so after e.g. a USB replug
+            # it has to be reopened explicitly rather than failing forever.
+            if payload["voltage"] < 0 and can_reconnect:
+                log.warning("Readout of PSU #%d failed, reopening the USB device",
+                            device_index)
+                if device().reconnect():
+                    payload = read_payload()
+        body = orjson.dumps(payload)
+        packed = READING_STRUCT.pack(payload["voltage"], payload["current"],
+                                     payload["on"])
+        return body, hashlib.sha1(body).hexdigest(), packed
+
+    read_cache = run_psu.TTLCache(fresh_reading, READ_CACHE_TTL)
+
+    def set_relay_locked(desired):
+        """Switch the relay. Caller must hold the lock."""
+        psu = device()
+        return psu.switch_on() if desired else psu.switch_off()
+
+    # Take the first reading now so the first /read is served from cache.
+    read_cache.get()
+
+    broadcaster = Broadcaster(lambda: read_cache.get()[0], STREAM_INTERVAL,
+                              STREAM_MAX_CLIENTS)
+
+    # ---------- End-points ------------------------------------------
+    @app.before_request
+    def require_json():
+        """
+        Reject POST bodies declared as something other than JSON (e.g. a
+        form post) with a 415 before any view parses them. A body without
+        a Content-Type is still accepted and parsed as JSON.
+        """
+        if request.method == "POST" and request.mimetype and not request.is_json:
+            return _error("Content-Type must be application/json", 415)
+
+    @app.before_request
+    def require_open():
+        """503 once cleanup_psu() has closed the PSU (i.e. during shutdown)."""
+        if run_psu.current_instance() is None:
+            return _error("PSU has been closed", 503)
+
+    def set_value(kind, value):
+        with lock:
+            ok = getattr(device(), kind)(value)
+            read_cache.invalidate()
+        return ojson({"ok": ok})
+
+    # The PSU's limits are fixed once it is constructed; bind them now.
+    for kind in setter_limits:
+        view = validated_scalar("value", 0.0, setter_limits[kind])(
+            functools.partial(set_value, kind))
+        app.add_url_rule(f"/{kind}", kind, view, methods=["POST"])
+
+    @app.get("/read")
+    def read():
+        """
+        Latest reading; honours If-None-Match, so pollers whose reading
+        has not changed get an empty 304 instead of the body.
+        """
+        body, etag, _ = read_cache.get()
+        resp = Response(body, headers=_READ_HEADERS)
+        resp.set_etag(etag)
+        return resp.make_conditional(request)
+
+    @app.get("/read.bin")
+    def read_bin():
+        """Latest reading packed as READING_STRUCT, for scrapers that poll fast."""
+        return Response(read_cache.get()[2], headers=_READ_BIN_HEADERS)
+
+    @app.get("/stream")
+    def stream():
+        """
+        Server-sent events: one "data: {voltage, current, on}" event per
+        STREAM_INTERVAL for as long as the client stays connected.
+
+        Each open stream occupies one server thread, so only
+        STREAM_MAX_CLIENTS may be open at once; further clients get a 503.
+        """
+        q = broadcaster.subscribe()
+        if q is None:
+            return _error("Too many open streams", 503)
+
+        def events():
+            try:
+                while True:
+                    yield b"data: " + q.get() + b"\n\n"
+            finally: # Client went away
+                broadcaster.unsubscribe(q)
+
+        return Response(events(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache"})
+
+    @app.get("/relay")
+    def relay_state():
+        """Return JSON: {"on": true|false} depending on PSU output state."""
+        try:
+            with lock:
+                on = device().is_relay_on()
+            return ojson({"on": on})
+        except Exception as exc:
+            log.error("Reading relay state failed: %s", exc)
+            return ojson({"error": str(exc)}, 500)
+
+    @app.post("/relay")
+    def set_relay():
+        """
+        Toggle the output relay.
+
+        Body JSON: {"state": true|false}
+        Returns   : {"ok": true, "on": true|false}
+        """
+        desired, err = _body_field("state", _as_bool)
+        if err:
+            return err
+
+        # ---- call the C++ layer via our psu instance ----
+        with lock:
+            ok = set_relay_locked(desired)
+            on = device().is_relay_on()
+            read_cache.invalidate()
+
+        if not ok:
+            return _error("PSU did not accept the command", 500)
+
+        return ojson({"ok": ok, "on": on})   # echo current state
+
+    def apply():
+        """
+        Set voltage, current limit and relay state in one request.
+
+        Body JSON: {"voltage": <float>, "current": <float>, "state": true|false}
+        Returns   : {"ok": true, "on": true|false}
+
+        All fields are validated before anything is written, and the write
+        is a single board transaction, so the PSU never runs with only part
+        of the new settings applied.
+        """
+        data = _json_body()
+        try:
+            voltage = _as_float(data["voltage"])
+            current = _as_float(data["current"])
+            state = _as_bool(data["state"])
+        except (KeyError, TypeError, ValueError):
+            return _error("JSON must contain numbers 'voltage', 'current' and boolean 'state'")
+        if not 0.0 <= voltage <= cfg.max_voltage:
+            return ojson({"error": f"Field 'voltage' = {voltage} outside "
+                                   f"range [0.0, {cfg.max_voltage}]"}, 400)
+        if not 0.0 <= current <= cfg.max_current:
+            return ojson({"error": f"Field 'current' = {current} outside "
+                                   f"range [0.0, {cfg.max_current}]"}, 400)
+
+        with lock:
+            psu = device()
+            ok = psu.apply(voltage, current, state)  # single USB transaction
+            on = psu.is_relay_on()
+            read_cache.invalidate()
+
+        if not ok:
+            return _error("PSU did not accept the command", 500)
+        return ojson({"ok": ok, "on": on})
+
+    # Three separate writes could stop halfway and leave part of the new
+    # settings applied, so builds without apply() do not offer /apply.
+    if has_apply:
+        app.add_url_rule("/apply", "apply", apply, methods=["POST"])
+    else:
+        log.warning("heinzinger_control has no apply(); POST /apply is "
+                    "disabled until the module is rebuilt.")
+
+    def run_batch_op(sub):
+        """Execute one /batch sub-request. Caller must hold the lock."""
+        op = sub.get("op") if isinstance(sub, dict) else None
+        try:
+            if op == "read":
+                return read_payload()
+            if op in setter_limits:
+                value, hi = _as_float(sub["value"]), setter_limits[op]
+                if not 0.0 <= value <= hi: # Same check as the single endpoints
+                    return {"error": f"Field 'value' = {value!r} outside range [0.0, {hi}]"}
+                return {"ok": getattr(device(), op)(value)}
+            if op == "relay":
+                ok = set_relay_locked(_as_bool(sub["state"]))
+                return {"ok": ok, "on": device().is_relay_on()}
+        except (KeyError, TypeError, ValueError):
+            return {"error": f"Invalid arguments for op '{op}'"}
+        return {"error": f"Unknown op '{op}'"}
+
+    @app.post("/batch")
+    def batch():
+        """
+        Run several PSU commands in a single HTTP round-trip.
+
+        Body JSON: {"requests": [{"op": "read"}, {"op": "set_voltage", "value": 1000}, ...]}
+        Returns   : {"responses": [...]}   one entry per sub-request, same order
+
+        Ops are "read", "set_voltage", "set_current" and "relay" (with "state").
+        The whole batch runs under one device lock, so it is not interleaved
+        with other clients.
+        """
+        data = _json_body()
+        subs = data.get("requests") if isinstance(data, dict) else None
+        if not isinstance(subs, list):
+            return _error("JSON must contain list field 'requests'")
+
+        with lock:
+            responses = [run_batch_op(sub) for sub in subs]
+            read_cache.invalidate()
+        return ojson({"responses": responses})
+
+    @app.get("/")
+    def root():
+        """
+        Which board this service drives, its limits and its endpoints, so
+        clients can tell the per-board services apart.
+        """
+        return Response(root_body, headers=_JSON_HEADERS)
+
+    # The PSU's configuration cannot change while the app runs, so the
+    # description is encoded once, after every route (including "/") exists.
+    root_body = orjson.dumps({
+        "psu": cfg,
+        "endpoints": sorted({r.rule for r in app.url_map.iter_rules()
+                             if r.endpoint != "static"}),
+    })
+
+    return app
@@ -1,106 +1,158 @@
 import sys
 import os
 import time
-import subprocess
-import sysconfig
+from importlib.machinery import EXTENSION_SUFFIXES
+import importlib.util
+import threading
+import logging
+from dataclasses import dataclass
 # --- Configuration ---
 # Path to the directory where your .so module was built
 # This should be your 'PythonWrapper/ADCBoardControlPython/build' directory
 MODULE_BUILD_DIR = os.path.join(os.path.dirname(__file__), 'build')
 
 # The expected name of your compiled module.
-# CMake produces this based on the module name in PYBIND11_MODULE and Python version/platform.
+# CMake produces this based on the module name in NB_MODULE and Python version/platform.
 # Your output showed: heinzinger_control.cpython-313-darwin.so
+# EXTENSION_SUFFIXES[0] is the interpreter's EXT_SUFFIX, already loaded at
+# startup, so there is no need to import and parse sysconfig for it.
 MODULE_FILENAME = (
-     'heinzinger_control' + sysconfig.get_config_var('EXT_SUFFIX')
+     'heinzinger_control' + EXTENSION_SUFFIXES[0]
 )
 PYTHON_MODULE_NAME = 'heinzinger_control' # Name used in "import heinzinger_control"
-CPP_CLASS_NAME_IN_PYTHON = 'HeinzingerPSU' # Name given in py::class_<...>(m, "HeinzingerPSU")
+CPP_CLASS_NAME_IN_PYTHON = 'HeinzingerPSU' # Name given in nb::class_<...>(m, "HeinzingerPSU")
+BOARD_USB_ID = 'a0a0:000c' # VID:PID of the analog interface board, as list_devices() reports it
+
+log = logging.getLogger(__name__)
 
 # --- Global variable for PSU instance ---
 _psu_instance = None
 _module_loaded = False
+PSUClass = None # The bound C++ class, resolved once by setup_module_path_and_load()
+_list_devices = None # heinzinger_control.list_devices, if the module has it
+_psu_init_lock = threading.Lock() # Guards the lazy init in get_psu_instance()
+# One USB transaction at a time on the PSU. Hold it around every call on the
+# instance, whether from the helpers below or from a service thread.
+# Re-entrant, so code holding it around a sequence (psu_service) can still
+# call the helpers below.
+psu_lock = threading.RLock()
 
-def setup_module_path_and_load():
-    """Adds the build directory to Python's path and tries to load the module."""
-    global _module_loaded
-
-    if not os.path.isdir(MODULE_BUILD_DIR):
-        print(f"ERROR: Build directory not found at {MODULE_BUILD_DIR}")
-        _module_loaded = False
-        return
+@dataclass(frozen=True, slots=True)
+class PSUConfig:
+    """
+    Parameters the PSU instance was constructed with (see initialize_psu).
+    Frozen: the C++ object keeps its own copy, so changing these afterwards
+    would only make the Python side disagree with the device's limits.
+    """
+    device_index: int
+    max_voltage: float
+    max_current: float
+    max_input_voltage: float
 
-    sys.path.insert(0, MODULE_BUILD_DIR)
-    print(f"Added '{MODULE_BUILD_DIR}' to sys.path.")
+psu_config = None # PSUConfig of the current instance, set by initialize_psu()
 
-    so_file_path = os.path.join(MODULE_BUILD_DIR, MODULE_FILENAME)
-    if not os.path.exists(so_file_path):
-        print(f"ERROR: Module file not found at {so_file_path}")
-        print("Please ensure you've built the module correctly and it's in the build directory.")
-        _module_loaded = False
-        return
-    else:
-        print(f"Module file found at {so_file_path}")
-
-    # Optional: Check shared library dependencies using otool -L (macOS specific)
+def _check_macos_dependencies(so_file_path):
+    """Logs the module's shared library dependencies using otool -L."""
+    import subprocess  # Only needed here; keeps it off the import path elsewhere
     try:
-        if sys.platform == 'darwin': # darwin is macOS
-            result = subprocess.run(['otool', '-L', so_file_path], capture_output=True, text=True, check=True)
-            print(f"\nShared library dependencies for {MODULE_FILENAME}:")
-            print(result.stdout)
-            if 'libusb-1.0.dylib' not in result.stdout:
-                print("WARNING: libusb-1.0.dylib does not appear in otool -L output. Make sure it's correctly linked or available in rpath/lib path.")
-            else:
-                print("libusb-1.0.dylib seems to be linked.")
-        elif sys.platform.startswith('linux'):
-            # On Linux, you could use 'ldd <so_file_path>'
-            print(f"On Linux, you can check dependencies with: ldd {so_file_path}")
-
+        result = subprocess.run(['otool', '-L', so_file_path], capture_output=True, text=True, check=True)
+        log.info("Shared library dependencies for %s:", MODULE_FILENAME)
+        log.info("%s", result.stdout)
+        if 'libusb-1.0.dylib' not in result.stdout:
+            log.warning("libusb-1.0.dylib does not appear in otool -L output. Make sure it's correctly linked or available in rpath/lib path.")
+        else:
+            log.info("libusb-1.0.dylib seems to be linked.")
     except FileNotFoundError:
-        print(f"WARNING: 'otool' (or 'ldd') not found. Cannot check shared library dependencies.")
+        log.warning("'otool' not found. Cannot check shared library dependencies.")
     except subprocess.CalledProcessError as e:
-        print(f"WARNING: 'otool -L' (or 'ldd') failed for {so_file_path}: {e}")
-        print("This might indicate linking issues or problems with the .so file itself.")
+        log.warning("'otool -L' failed for %s: %s", so_file_path, e)
+        log.warning("This might indicate linking issues or problems with the .so file itself.")
     except Exception as e:
-        print(f"WARNING: Could not check shared library dependencies: {e}")
+        log.warning("Could not check shared library dependencies: %s", e)
+
+def setup_module_path_and_load():
+    """
+    Loads the module straight from its file in the build directory.
+
+    Going through the file path means sys.path is neither searched nor
+    modified. Returns whether the module is loaded. Once it is, further calls
+    return immediately without touching the filesystem again.
+    """
+    global _module_loaded, PSUClass, _list_devices
+    if _module_loaded:
+        return True
+
+    so_file_path = os.path.join(MODULE_BUILD_DIR, MODULE_FILENAME)
+    try:
+        os.stat(so_file_path) # One syscall on the common (successful) path
+    except OSError:
+        if not os.path.isdir(MODULE_BUILD_DIR):
+            log.error("Build directory not found at %s", MODULE_BUILD_DIR)
+        else:
+            log.error("Module file not found at %s", so_file_path)
+            log.error("Please ensure you've built the module correctly and it's in the build directory.")
+        _module_loaded = False
+        return False
+    log.info("Module file found at %s", so_file_path)
 
     # Try to import the module
     try:
-        # The import name is just the module name, without .so or python tags
-        module = __import__(PYTHON_MODULE_NAME)
-        globals()[PYTHON_MODULE_NAME] = module # Make it available like a normal import
-        print(f"\nSuccessfully imported '{PYTHON_MODULE_NAME}' module.")
+        module = sys.modules.get(PYTHON_MODULE_NAME)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(PYTHON_MODULE_NAME, so_file_path)
+            module = importlib.util.module_from_spec(spec) # Runs the extension's init
+            sys.modules[PYTHON_MODULE_NAME] = module # Later "import heinzinger_control" reuses it
+            spec.loader.exec_module(module)
+        log.info("Successfully imported '%s' module.", PYTHON_MODULE_NAME)
+        PSUClass = getattr(module, CPP_CLASS_NAME_IN_PYTHON) # Looked up once, used by initialize_psu()
+        _list_devices = getattr(module, 'list_devices', None) # Older builds lack it
+        if not hasattr(PSUClass, 'read_all'):
+            log.warning("heinzinger_control has no read_all(); rebuild the module "
+                        "for single-transaction reads.")
         _module_loaded = True
+    except AttributeError as e:
+        log.error("Class '%s' not found in module '%s'.", CPP_CLASS_NAME_IN_PYTHON, PYTHON_MODULE_NAME)
+        log.error("Binding error or mismatch (rebuild the module?) Details: %s", e)
+        _module_loaded = False
     except ImportError as e:
-        print(f"ERROR: Failed to import '{PYTHON_MODULE_NAME}' module.")
-        print(f"Ensure '{MODULE_BUILD_DIR}' is in sys.path and contains '{MODULE_FILENAME}'.")
-        print(f"Ensure all dependencies like libusb-1.0.dylib are installed and accessible.")
-        print(f"  (On macOS, try 'brew install libusb' and ensure it's linked).")
-        print(f"Import error details: {e}")
+        log.error("Failed to import '%s' module.", PYTHON_MODULE_NAME)
+        log.error("Ensure '%s' was built for this Python version.", so_file_path)
+        log.error("Ensure all dependencies like libusb-1.0.dylib are installed and accessible.")
+        log.error("  (On macOS, try 'brew install libusb' and ensure it's linked).")
+        log.error("Import error details: %s", e)
         _module_loaded = False
+        # Only worth spawning a tool for when the import actually failed
+        if sys.platform == 'darwin': # darwin is macOS
+            _check_macos_dependencies(so_file_path)
+        elif sys.platform.startswith('linux'):
+            # On Linux, you could use 'ldd <so_file_path>'
+            log.info("On Linux, you can check dependencies with: ldd %s", so_file_path)
     except Exception as e:
-        print(f"An unexpected error occurred during import: {e}")
+        log.error("An unexpected error occurred during import: %s", e)
         _module_loaded = False
+    return _module_loaded
 
 def initialize_psu(device_index=0, max_v=30000.0, max_c=25, verb=False, max_in_v=10.0):
     """Initializes connection to the PSU."""
-    global _psu_instance
+    global _psu_instance, psu_config
     if not _module_loaded:
-        print("ERROR: Python module not loaded. Cannot initialize PSU.")
+        log.error("Python module not loaded. Cannot initialize PSU.")
         return False
     if _psu_instance is not None:
-        print("PSU already initialized.")
+        log.info("PSU already initialized.")
         return True
-    try:
-        # Access the module and class correctly
-        psu_module = globals().get(PYTHON_MODULE_NAME)
-        if not psu_module:
-            print(f"ERROR: Module '{PYTHON_MODULE_NAME}' not found in globals after import.")
+    if _list_devices is not None:
+        # The C++ constructor exits the process when the board is missing;
+        # look first, in-process, so callers get False instead. device_index
+        # counts interface boards in USB enumeration order.
+        boards = _list_devices().count(BOARD_USB_ID)
+        if device_index >= boards:
+            log.error("PSU #%d requested, but %d interface board(s) found on USB.", device_index, boards)
             return False
-            
-        PSUClass = getattr(psu_module, CPP_CLASS_NAME_IN_PYTHON)
-        _psu_instance = PSUClass(device_index=device_index, max_voltage=max_v, max_current=max_c, verbose=verb, max_input_voltage=max_in_v)
-        print("PSU C++ object instance created successfully.")
+    try:
+        _psu_instance = PSUClass(device_index=device_index, max_voltage=max_v, max_current=max_c, verbose=bool(verb), max_input_voltage=max_in_v)
+        psu_config = PSUConfig(device_index, float(max_v), float(max_c), float(max_in_v))
+        log.info("PSU C++ object instance created successfully.")
         # The C++ constructor already tries to open the device.
         # A short delay might be good practice after initialization if the device needs it.
         time.sleep(0.1) # Small delay
@@ -111,124 +163,232 @@ def initialize_psu(device_index=0, max_v=30000.0, max_c=25, verb=False, max_in_v
         #     _psu_instance = None
         #     return False
         return True
-    except AttributeError as e:
-        print(f"ERROR: Class '{CPP_CLASS_NAME_IN_PYTHON}' not found in module '{PYTHON_MODULE_NAME}'.")
-        print(f"Pybind11 binding error or mismatch? Details: {e}")
-        _psu_instance = None
-        return False
     except Exception as e:
-        print(f"ERROR during PSU initialization: {e}")
+        log.error("PSU initialization failed: %s", e)
         _psu_instance = None
         return False
 
 def set_psu_voltage(voltage):
     """Sets PSU voltage. Returns True on success, False on error from C++."""
     if _psu_instance is None:
-        print("ERROR: PSU not initialized. Call initialize_psu() first.")
+        log.error("PSU not initialized. Call initialize_psu() first.")
         return False
     try:
-        print(f"Python: Calling C++ set_voltage({voltage})")
-        success = _psu_instance.set_voltage(float(voltage)) # Ensure float
-        print(f"Python: C++ set_voltage returned: {success}")
+        voltage = float(voltage) # Ensure float
+        # Same bounds the C++ side enforces; reject here without a C++ call.
+        limit = psu_config.max_voltage
+        if not 0.0 <= voltage <= limit:
+            log.error("Voltage %s outside range [0, %s]", voltage, limit)
+            return False
+        log.debug("Calling C++ set_voltage(%s)", voltage)
+        with psu_lock:
+            success = _psu_instance.set_voltage(voltage)
+        log.debug("C++ set_voltage returned: %s", success)
         return success
     except Exception as e:
-        print(f"ERROR setting voltage: {e}")
+        log.error("Error setting voltage: %s", e)
         return False
 
 def read_psu_voltage():
     """Reads PSU voltage. Returns voltage value, or raises an exception on error."""
     if _psu_instance is None:
-        print("ERROR: PSU not initialized. Call initialize_psu() first.")
+        log.error("PSU not initialized. Call initialize_psu() first.")
         raise RuntimeError("PSU not initialized")
     try:
-        print(f"Python: Calling C++ read_voltage()")
-        voltage = _psu_instance.read_voltage()
-        print(f"Python: C++ read_voltage returned: {voltage}")
+        log.debug("Calling C++ read_voltage()")
+        with psu_lock:
+            voltage = _psu_instance.read_voltage()
+        log.debug("C++ read_voltage returned: %s", voltage)
         return voltage
     except Exception as e:
-        print(f"ERROR reading voltage: {e}")
+        log.error("Error reading voltage: %s", e)
         raise # Re-raise the exception to be handled by the caller
 
 def set_psu_current(current):
     """Sets PSU current limit. Returns True on success, False on error."""
     if _psu_instance is None:
-        print("ERROR: PSU not initialized. Call initialize_psu() first.")
+        log.error("PSU not initialized. Call initialize_psu() first.")
         return False
     try:
-        print(f"Python: Calling C++ set_current({current})")
-        success = _psu_instance.set_current(float(current)) # Ensure float
-        print(f"Python: C++ set_current returned: {success}")
+        current = float(current) # Ensure float
+        # Same bounds the C++ side enforces; reject here without a C++ call.
+        limit = psu_config.max_current
+        if not 0.0 <= current <= limit:
+            log.error("Current %s outside range [0, %s]", current, limit)
+            return False
+        log.debug("Calling C++ set_current(%s)", current)
+        with psu_lock:
+            success = _psu_instance.set_current(current)
+        log.debug("C++ set_current returned: %s", success)
         return success
     except Exception as e:
-        print(f"ERROR setting current: {e}")
+        log.error("Error setting current: %s", e)
         return False
 
 def read_psu_current():
     """Reads PSU current. Returns current value, or raises an exception on error."""
     if _psu_instance is None:
-        print("ERROR: PSU not initialized. Call initialize_psu() first.")
+        log.error("PSU not initialized. Call initialize_psu() first.")
         raise RuntimeError("PSU not initialized")
     try:
-        print(f"Python: Calling C++ read_current()")
-        current = _psu_instance.read_current()
-        print(f"Python: C++ read_current returned: {current}")
+        log.debug("Calling C++ read_current()")
+        with psu_lock:
+            current = _psu_instance.read_current()
+        log.debug("C++ read_current returned: %s", current)
         return current
     except Exception as e:
-        print(f"ERROR reading current: {e}")
+        log.error("Error reading current: %s", e)
+        raise # Re-raise
+
+def read_psu_all():
+    """
+    Reads (voltage, current, relay_on) from a single board readout.
+    Returns the tuple, or raises an exception on error.
+    """
+    if _psu_instance is None:
+        log.error("PSU not initialized. Call initialize_psu() first.")
+        raise RuntimeError("PSU not initialized")
+    try:
+        with psu_lock:
+            psu = _psu_instance # Re-read under the lock; cleanup_psu() may have run
+            if psu is None:
+                raise RuntimeError("PSU has been closed")
+            if hasattr(psu, "read_all"):
+                log.debug("Calling C++ read_all()")
+                reading = psu.read_all()
+            else:
+                # Module built before read_all() existed: one readout per quantity.
+                log.debug("Calling C++ read_voltage(), read_current(), is_relay_on()")
+                reading = (psu.read_voltage(), psu.read_current(), psu.is_relay_on())
+        log.debug("C++ reading: %s", reading)
+        return reading
+    except Exception as e:
+        log.error("Error reading PSU: %s", e)
         raise # Re-raise
 
 def switch_psu_on():
     """Turns the PSU output ON. Returns True on success, False on error."""
     if _psu_instance is None:
-        print("ERROR: PSU not initialized. Call initialize_psu() first.")
+        log.error("PSU not initialized. Call initialize_psu() first.")
         return False
     try:
-        print(f"Python: Calling C++ switch_on()")
-        success = _psu_instance.switch_on()
-        print(f"Python: C++ switch_on returned: {success}")
+        log.debug("Calling C++ switch_on()")
+        with psu_lock:
+            success = _psu_instance.switch_on()
+        log.debug("C++ switch_on returned: %s", success)
         return success
     except Exception as e:
-        print(f"ERROR turning PSU on: {e}")
+        log.error("Error turning PSU on: %s", e)
         return False
 
 def switch_psu_off():
     """Turns the PSU output OFF. Returns True on success, False on error."""
     if _psu_instance is None:
-        print("ERROR: PSU not initialized. Call initialize_psu() first.")
+        log.error("PSU not initialized. Call initialize_psu() first.")
         return False
     try:
-        print(f"Python: Calling C++ switch_off()")
-        success = _psu_instance.switch_off()
-        print(f"Python: C++ switch_off returned: {success}")
+        log.debug("Calling C++ switch_off()")
+        with psu_lock:
+            success = _psu_instance.switch_off()
+        log.debug("C++ switch_off returned: %s", success)
         return success
     except Exception as e:
-        print(f"ERROR turning PSU off: {e}")
+        log.error("Error turning PSU off: %s", e)
         return False
 
 def cleanup_psu():
-    """Cleans up PSU resources by deleting the Python object instance."""
-    global _psu_instance
-    if _psu_instance is not None:
-        print("Cleaning up PSU instance (Python object deletion will trigger C++ destructor).")
-        # The C++ destructor of HeinzingerVia16BitDAC (via FGAnalogPSUInterface -> FGUSBBulk)
-        # should handle closing the USB device and releasing the interface.
-        _psu_instance = None # Allow Python's garbage collector to reclaim it
+    """
+    Releases the PSU's USB interface and forgets the instance.
+
+    The interface is closed explicitly rather than left to the destructor,
+    so it is released even while some caller still holds the object. Calls
+    made on a closed instance fail (False, or -1 for readings) without
+    touching the device.
+
+    Safe to call more than once and from any thread (e.g. from atexit while
+    a service thread is mid-transfer): later calls find nothing to do.
+    """
+    global _psu_instance, psu_config
+    with _psu_init_lock, psu_lock: # Never pull the device out from under a transfer
+        instance, _psu_instance = _psu_instance, None
+        psu_config = None
+        closed = instance is not None and hasattr(instance, "close") # Older builds lack close()
+        if closed:
+            instance.close()
+    if instance is None:
+        log.info("PSU instance already None or not initialized.")
+    elif closed:
+        log.info("PSU instance cleaned up, USB interface released.")
     else:
-        print("PSU instance already None or not initialized.")
+        log.warning("heinzinger_control has no close(); the USB interface is "
+                    "released only once the PSU object is freed.")
     return True
 
+def current_instance():
+    """
+    The open PSU instance, or None before initialize_psu() and after
+    cleanup_psu(). Unlike get_psu_instance() it never opens the device.
+    """
+    return _psu_instance
+
 def get_psu_instance(device_index=0, verb=False):
     """
     Ensure the PSU is ready and return the singleton instance.
+
+    Safe to call from several threads: only the first caller loads the
+    module and opens the device, the others wait and get the same object.
     """
-    if _psu_instance is None:
-        setup_module_path_and_load()
-        initialize_psu(device_index=device_index, verb=verb)
+    if _psu_instance is not None: # Fast path, no lock once initialized
+        return _psu_instance
+    with _psu_init_lock:
+        if _psu_instance is None: # Re-check, another thread may have won
+            setup_module_path_and_load()
+            initialize_psu(device_index=device_index, verb=verb)
     return _psu_instance
 
 
+class TTLCache:
+    """
+    Remembers the result of fetch() for `ttl` seconds.
+
+    Callers arriving within the window (or while a fetch is running) get the
+    same result instead of querying the device again; the latter holds even
+    with ttl=0, so a burst of concurrent reads costs one device transaction.
+    invalidate() makes the next get() fetch fresh data, e.g. after a new
+    setpoint was written.
+    """
+    def __init__(self, fetch, ttl):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._value = None
+        self._t = 0.0
+        self._valid = False
+        self._generation = 0 # Bumped by invalidate()
+        self._fetches = 0    # Completed fetches, to spot one we queued behind
+        self._lock = threading.Lock()
+
+    def get(self):
+        fetches = self._fetches
+        with self._lock:
+            joined = self._fetches != fetches # A fetch finished while we waited
+            if not self._valid or not (joined or time.monotonic() - self._t <= self.ttl):
+                generation = self._generation
+                self._value = self.fetch()
+                self._t = time.monotonic()
+                self._fetches += 1
+                # An invalidate() that raced with the fetch wins: the value is
+                # returned to this caller but not reused.
+                self._valid = generation == self._generation
+            return self._value
+
+    def invalidate(self):
+        self._generation += 1
+        self._valid = False
+
+
 # Main execution block
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     setup_module_path_and_load()
 
     if not _module_loaded:
@@ -255,8 +415,7 @@ if __name__ == '__main__':
 
             # Read initial state
             try:
-                v_read = read_psu_voltage()
-                c_read = read_psu_current()
+                v_read, c_read, _ = read_psu_all()
                 print(f"Initial Read: Voltage = {v_read:.2f} V, Current = {c_read:.4f} mA") # Assuming current is in mA from C++
             except Exception as e_read:
                 print(f"Error reading initial state: {e_read}")
@@ -299,9 +458,8 @@ if __name__ == '__main__':
                         print("Failed to turn PSU OFF.")
                 elif user_input == 'read':
                     try:
-                        v_read = read_psu_voltage()
-                        c_read = read_psu_current()
-                        print(f"Read: Voltage = {v_read:.2f} V, Current = {c_read:.4f} mA")
+                        v_read, c_read, on = read_psu_all() # One USB transaction
+                        print(f"Read: Voltage = {v_read:.2f} V, Current = {c_read:.4f} mA, Output = {'ON' if on else 'OFF'}")
                     except Exception as e_read:
                         print(f"Error during read: {e_read}")
                 else: